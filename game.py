@@ -1,33 +1,98 @@
+import os
 import sys
-import secrets
 import hmac
-import hashlib
-from typing import List
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import List, Tuple
 
 
 class Dice:
+    __slots__ = (
+        "values",
+        "sides",
+        "sorted_values",
+        "face_counts",
+        "valid_picks",
+        "display",
+        "_repr",
+    )
+
     def __init__(self, values: List[int]):
-        self.values = values
+        self.values = tuple(values)
+        self.sides = len(self.values)
+        self.sorted_values = tuple(sorted(self.values))
+        self.face_counts = tuple(Counter(self.values).items())
+        self.valid_picks = {str(i): i for i in range(self.sides)}
+        self.display = ", ".join(map(str, self.values))
+        self._repr = f"Dice({self.display})"
 
     def __repr__(self):
-        return f"Dice({', '.join(map(str, self.values))})"
+        return self._repr
 
 
 class RandomKeyGenerator:
-    @staticmethod
-    def generate_secure_key() -> bytes:
-        return secrets.token_bytes(32)
-
-    @staticmethod
-    def generate_random_number(upper_bound: int) -> int:
-        return secrets.randbelow(upper_bound)
+    def __init__(self, buffer_size: int = 128):
+        self.buffer_size = buffer_size
+        self.entropy = os.urandom(buffer_size)
+        self.offset = 0
+
+    def refill(self, size: int = 0):
+        self.entropy = os.urandom(max(self.buffer_size, size))
+        self.offset = 0
+
+    def take_bytes(self, size: int) -> bytes:
+        if self.offset + size > len(self.entropy):
+            self.refill(size)
+        chunk = self.entropy[self.offset : self.offset + size]
+        self.offset += size
+        return chunk
+
+    def generate_secure_key(self) -> bytes:
+        return self.take_bytes(32)
+
+    def generate_random_number(self, upper_bound: int) -> int:
+        bits = (upper_bound - 1).bit_length()
+        if bits <= 8:
+            shift = 8 - bits
+            while True:
+                if self.offset >= len(self.entropy):
+                    self.refill()
+                candidate = self.entropy[self.offset] >> shift
+                self.offset += 1
+                if candidate < upper_bound:
+                    return candidate
+
+        size = (bits + 7) // 8
+        while True:
+            candidate = int.from_bytes(self.take_bytes(size), "big")
+            candidate >>= size * 8 - bits
+            if candidate < upper_bound:
+                return candidate
 
 
 class HMACCalculator:
+    ALGORITHM = "sha256"
+    MESSAGES = [value.to_bytes(2, "big") for value in range(256)]
+
+    @staticmethod
+    def has_sha_extensions() -> bool:
+        try:
+            with open("/proc/cpuinfo") as cpuinfo:
+                for line in cpuinfo:
+                    # x86 reports SHA extensions as "sha_ni", ARMv8 as "sha2".
+                    if line.startswith(("flags", "Features")):
+                        return not {"sha_ni", "sha2"}.isdisjoint(line.split())
+        except OSError:
+            pass
+        return False
+
     @staticmethod
     def calculate_hmac(value: int, key: bytes) -> str:
-        message = str(value).encode()
-        return hmac.new(key, message, hashlib.sha3_256).hexdigest()
+        if value < len(HMACCalculator.MESSAGES):
+            message = HMACCalculator.MESSAGES[value]
+        else:
+            message = value.to_bytes(2, "big")
+        return hmac.digest(key, message, HMACCalculator.ALGORITHM).hex()
 
 
 class DiceParser:
@@ -43,7 +108,7 @@ class DiceParser:
 
         for arg in args:
             try:
-                values = list(map(int, arg.split(",")))
+                values = tuple(map(int, arg.split(",")))
             except ValueError:
                 raise ValueError(
                     f"Invalid dice configuration: {arg}. Ensure each value is an integer."
@@ -68,13 +133,18 @@ class DiceParser:
 
 
 class FirstMoveProtocol:
-    def __init__(self):
-        self.secret_key = RandomKeyGenerator.generate_secure_key()
+    def __init__(self, random_generator: RandomKeyGenerator):
+        self.random_generator = random_generator
+        self.secret_key = random_generator.generate_secure_key()
         self.first_player = None
 
     def determine_first_move(self):
         print("Determining who makes the first move...")
-        random_number = RandomKeyGenerator.generate_random_number(2)
+        acceleration = (
+            " (hardware accelerated)" if HMACCalculator.has_sha_extensions() else ""
+        )
+        print(f"HMAC algorithm: {HMACCalculator.ALGORITHM}{acceleration}")
+        random_number = self.random_generator.generate_random_number(2)
         hmac_value = HMACCalculator.calculate_hmac(random_number, self.secret_key)
         print(f"HMAC={hmac_value}")
 
@@ -99,81 +169,133 @@ class FirstMoveProtocol:
 
 class ProbabilityCalculator:
     @staticmethod
-    def calculate_win_probability(user_dice: Dice, computer_dice: Dice) -> float:
-        if user_dice == computer_dice:
-            return 0.0
-
+    def count_outcomes(user_dice: Dice, computer_dice: Dice) -> Tuple[int, int]:
+        computer_rolls = computer_dice.sorted_values
         user_wins = 0
-        total_comparisons = len(user_dice.values) * len(computer_dice.values)
+        ties = 0
+        for user_roll, user_count in user_dice.face_counts:
+            lower = bisect_left(computer_rolls, user_roll)
+            upper = bisect_right(computer_rolls, user_roll, lower)
+            user_wins += user_count * lower
+            ties += user_count * (upper - lower)
+
+        return user_wins, ties
 
-        for user_roll in user_dice.values:
-            for computer_roll in computer_dice.values:
-                if user_roll > computer_roll:
-                    user_wins += 1
+    @staticmethod
+    def calculate_probability_matrix(dice_list: List[Dice]) -> List[List[float]]:
+        dice_count = len(dice_list)
+        matrix = [[0.0] * dice_count for _ in range(dice_count)]
+
+        # Each unordered pair is counted once: the computer's wins against the
+        # user are the comparisons that are neither user wins nor ties.
+        for i in range(dice_count):
+            for j in range(i + 1, dice_count):
+                total_comparisons = dice_list[i].sides * dice_list[j].sides
+                user_wins, ties = ProbabilityCalculator.count_outcomes(
+                    dice_list[i], dice_list[j]
+                )
+                matrix[i][j] = user_wins / total_comparisons
+                computer_wins = total_comparisons - user_wins - ties
+                matrix[j][i] = computer_wins / total_comparisons
 
-        return user_wins / total_comparisons
+        return matrix
 
 
 class ProbabilityTable:
     @staticmethod
-    def display_probabilities(available_dice: List[Dice]):
-        print("\nProbabilities of winning for each dice pair:")
-        print("User Dice \\ Computer Dice | Probability of Winning")
-        print("---------------------------------------------")
-        for user_dice in available_dice:
-            for computer_dice in available_dice:
-                if user_dice != computer_dice:
-                    user_win_prob = ProbabilityCalculator.calculate_win_probability(
-                        user_dice, computer_dice
-                    )
-                    print(
-                        f"{user_dice.values} vs {computer_dice.values} | {user_win_prob:.2f}"
-                    )
-        print("")
+    def display_probabilities(
+        dice_list: List[Dice],
+        win_probabilities: List[List[float]],
+        available_indices: List[int],
+    ):
+        lines = [
+            "",
+            "Probabilities of winning for each dice pair:",
+            "User Dice \\ Computer Dice | Probability of Winning",
+            "---------------------------------------------",
+        ]
+        lines.extend(
+            f"[{dice_list[user_idx].display}] vs "
+            f"[{dice_list[computer_idx].display}] | "
+            f"{win_probabilities[user_idx][computer_idx]:.2f}"
+            for user_idx in available_indices
+            for computer_idx in available_indices
+            if user_idx != computer_idx
+        )
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
 
 
 class DiceGame:
+    __slots__ = (
+        "dice_list",
+        "computer_dice_index",
+        "user_dice_index",
+        "win_probabilities",
+        "random_generator",
+        "first_move_protocol",
+    )
+
     def __init__(self, dice_list: List[Dice]):
         self.dice_list = dice_list
-        self.computer_dice = None
-        self.user_dice = None
-        self.first_move_protocol = FirstMoveProtocol()
+        self.computer_dice_index = None
+        self.user_dice_index = None
+        self.win_probabilities = ProbabilityCalculator.calculate_probability_matrix(
+            dice_list
+        )
+        self.random_generator = RandomKeyGenerator()
+        self.first_move_protocol = FirstMoveProtocol(self.random_generator)
 
-    def play_turn(self, player: str, available_dice: List[Dice]):
+    def play_turn(self, player: str, available_indices: List[int]) -> int:
         if player == "computer":
-            computer_choice_index = RandomKeyGenerator.generate_random_number(
-                len(available_dice)
+            computer_choice_index = self.random_generator.generate_random_number(
+                len(available_indices)
             )
-            self.computer_dice = available_dice[computer_choice_index]
-            print(f"Computer chose: {self.computer_dice}")
+            self.computer_dice_index = available_indices[computer_choice_index]
+            print(f"Computer chose: {self.dice_list[self.computer_dice_index]}")
+            return self.computer_dice_index
         else:
+            valid_choices = {
+                str(idx): dice_idx for idx, dice_idx in enumerate(available_indices)
+            }
+            menu_lines = ["Choose your dice or type 'help' for probabilities:"]
+            menu_lines.extend(
+                f"{idx}: {self.dice_list[dice_idx].display}"
+                for idx, dice_idx in enumerate(available_indices)
+            )
+            menu = "\n".join(menu_lines) + "\n"
             while True:
-                print("Choose your dice or type 'help' for probabilities:")
-                for idx, dice in enumerate(available_dice):
-                    print(f"{idx}: {', '.join(map(str, dice.values))}")
+                sys.stdout.write(menu)
                 choice = input("Your choice: ").strip()
                 if choice.lower() == "help":
-                    ProbabilityTable.display_probabilities(available_dice)
-                elif choice.isdigit() and 0 <= int(choice) < len(available_dice):
-                    self.user_dice = available_dice[int(choice)]
-                    print(f"You chose: {self.user_dice}")
-                    break
-                else:
+                    ProbabilityTable.display_probabilities(
+                        self.dice_list, self.win_probabilities, available_indices
+                    )
+                    continue
+                dice_idx = valid_choices.get(choice)
+                if dice_idx is None:
                     print("Invalid choice. Try again.")
-
-    def generate_throw(self, dice: Dice):
-        secret_key = RandomKeyGenerator.generate_secure_key()
-        computer_choice = RandomKeyGenerator.generate_random_number(len(dice.values))
+                    continue
+                self.user_dice_index = dice_idx
+                print(f"You chose: {self.dice_list[self.user_dice_index]}")
+                return self.user_dice_index
+
+    def commit_throw(self, dice: Dice) -> Tuple[bytes, int, str]:
+        secret_key = self.random_generator.generate_secure_key()
+        computer_choice = self.random_generator.generate_random_number(dice.sides)
         hmac_value = HMACCalculator.calculate_hmac(computer_choice, secret_key)
-        print(
-            f"Choosing a number between 0-{len(dice.values) - 1} (HMAC: {hmac_value})"
-        )
+        return secret_key, computer_choice, hmac_value
+
+    def generate_throw(self, dice: Dice, commitment: Tuple[bytes, int, str]):
+        sides = dice.sides
+        secret_key, computer_choice, hmac_value = commitment
+        print(f"Choosing a number between 0-{sides - 1} (HMAC: {hmac_value})")
         user_choice = self.manual_pick(dice)
 
         total = computer_choice + user_choice
-        index = total % len(dice.values)
+        index = total % sides
         print(
-            f"The result is {computer_choice} + {user_choice} = {index} (mod {len(dice.values)})"
+            f"The result is {computer_choice} + {user_choice} = {index} (mod {sides})"
         )
         print(f"KEY: {secret_key.hex()}")
 
@@ -182,42 +304,49 @@ class DiceGame:
     def play_game(self):
         self.first_move_protocol.determine_first_move()
 
-        available_dice = self.dice_list.copy()
         if self.first_move_protocol.first_player == "computer":
-            self.play_turn("computer", available_dice)
-            available_dice.remove(self.computer_dice)
-            self.play_turn("user", available_dice)
+            first_player, second_player = "computer", "user"
         else:
-            self.play_turn("user", available_dice)
-            available_dice.remove(self.user_dice)
-            self.play_turn("computer", available_dice)
+            first_player, second_player = "user", "computer"
+
+        all_indices = range(len(self.dice_list))
+        chosen_idx = self.play_turn(first_player, list(all_indices))
+        available_indices = [i for i in all_indices if i != chosen_idx]
+        self.play_turn(second_player, available_indices)
 
     def end_game(self):
+        computer_dice = self.dice_list[self.computer_dice_index]
+        user_dice = self.dice_list[self.user_dice_index]
+        computer_commitment = self.commit_throw(computer_dice)
+        user_commitment = self.commit_throw(user_dice)
+
         print("")
         print("Lets generate my throw:")
-        computer_index = self.generate_throw(self.computer_dice)
-        computer_throw = self.computer_dice.values[computer_index]
+        computer_index = self.generate_throw(computer_dice, computer_commitment)
+        computer_throw = computer_dice.values[computer_index]
         print(f"My throw: {computer_throw}")
         print("")
         print("Now lets generate your throw:")
-        user_index = self.generate_throw(self.user_dice)
-        user_throw = self.user_dice.values[user_index]
-        print(f"Your throw: {user_throw}")
-
-        print("")
+        user_index = self.generate_throw(user_dice, user_commitment)
+        user_throw = user_dice.values[user_index]
 
         if computer_throw == user_throw:
-            print(f"{computer_throw} = {user_throw}: It's a tie!")
+            result = f"{computer_throw} = {user_throw}: It's a tie!"
         elif user_throw > computer_throw:
-            print(f"{computer_throw} < {user_throw}: You win!")
+            result = f"{computer_throw} < {user_throw}: You win!"
         else:
-            print(f"{computer_throw} > {user_throw}: Computer wins!")
+            result = f"{computer_throw} > {user_throw}: Computer wins!"
+
+        sys.stdout.write(f"Your throw: {user_throw}\n\n{result}\n")
 
     def manual_pick(self, dice: Dice):
+        prompt = f"Pick a number (0-{dice.sides - 1}): "
+        valid_picks = dice.valid_picks
         while True:
-            choice = input(f"Pick a number (0-{len(dice.values) - 1}): ").strip()
-            if choice.isdigit() and 0 <= int(choice) < len(dice.values):
-                return int(choice)
+            choice = input(prompt).strip()
+            pick = valid_picks.get(choice)
+            if pick is not None:
+                return pick
             print("Invalid choice. Try again.")
 
 